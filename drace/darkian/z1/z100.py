@@ -1,7 +1,7 @@
 import ast
 import re
 
-from drace.types import Context, Dict
+from drace.types import Context, Dict, NodeIndex
 from drace.constants import KEYWORDS
 
 
@@ -91,15 +91,17 @@ def _group_assignments_by_indent(assign_ln:
     return groups
 
 
-def _collect_assignment_lines_and_blocks(tree
+def _collect_assignment_lines_and_blocks(nodes: NodeIndex
         ) -> list[tuple[int, ast.AST]]:
     """
     Return list of (lineno, node) for assignment-like
     statements found in AST, sorted by lineno.
     """
-    out = []
+    out     = []
+    assigns = nodes.get(ast.Assign, []) \
+            + nodes.get(ast.AnnAssign, [])
 
-    for node in ast.walk(tree):
+    for node in assigns:
         if _is_simple_assignment(node):
             # Some AnnAssign (x: int = 1) may not have lineno
             # if generated; check presence
@@ -116,10 +118,10 @@ def check_z100(context: Context) -> list[Dict]:
           assignment blocks.
     """
     lines     = context["lines"]
-    tree      = context["tree"]
+    nodes     = context["nodes"]
     file      = context["file"]
     results   = []
-    assigns   = _collect_assignment_lines_and_blocks(tree)
+    assigns   = _collect_assignment_lines_and_blocks(nodes)
     assign_ln = [ln for ln, _ in assigns]
     groups    = _group_assignments_by_indent(assign_ln, lines)
 
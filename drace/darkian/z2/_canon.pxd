@@ -0,0 +1,10 @@
+# Declarations Cython applies when compiling _canon.py; the
+# implementation itself lives only in the .py file
+
+cdef class Canonicalizer:
+    cdef public dict var_map, arg_map, attr_map
+    cdef dict _dispatch
+
+    cpdef str dump(self, node)
+    cpdef str generic_dump(self, node, dict replace=*)
+    cpdef str _map(self, str name, dict space, str pfx)
@@ -0,0 +1,142 @@
+# The pure-Python source of this module is also what the
+# optional compiled build is made from (see setup.py); the
+# compiled module shadows it on import when it was built
+# ======================== STANDARDS ========================
+import ast
+
+
+# Per node class: (field, field is optional) pairs
+_FIELDS = {}
+
+
+def _fields(cls: type) -> tuple[tuple[str, bool], ...]:
+    fields = _FIELDS.get(cls)
+    if fields is None:
+        fields = _FIELDS[cls] = tuple((name, getattr(cls,
+                 name, ...) is None) for name in cls._fields)
+    return fields
+
+
+class Canonicalizer:
+    """
+    Canonicalize AST blocks while preserving *semantic shape*.
+    Separate namespaces for vars / args / attrs.
+    Constants are bucketed by kind, not value.
+
+    The canonical form is produced directly as a dump in the
+    format of `ast.dump(node, annotate_fields=False)`; nodes
+    are never modified, so the same code always canonicalizes
+    the same way no matter how often it is visited.
+    """
+
+    def __init__(self):
+        self.var_map  = {}
+        self.arg_map  = {}
+        self.attr_map = {}
+
+        # Resolve dumpers by node type once instead of
+        # formatting and looking up a method name per node
+        self._dispatch = {
+            ast.Name: self.dump_Name,
+            ast.arg: self.dump_arg,
+            ast.Attribute: self.dump_Attribute,
+            ast.Constant: self.dump_Constant,
+            ast.FunctionDef: self.dump_FunctionDef,
+            ast.ClassDef: self.dump_ClassDef,
+        }
+
+    def dump(self, node) -> str:
+        dumper = self._dispatch.get(type(node))
+        if dumper is None: return self.generic_dump(node)
+        return dumper(node)
+
+    def generic_dump(self, node, replace=None) -> str:
+        """
+        Dump `node` field by field, dumping `replace[field]`
+        in place of the fields it names. Replaced fields are
+        still walked, so names they hold are mapped exactly as
+        if they were kept.
+        """
+        cls = type(node)
+        if cls is list:
+            return "[" + ", ".join(map(self.dump, node)) + "]"
+        if not isinstance(node, ast.AST): return repr(node)
+
+        # Like ast.dump, once a field is skipped the rest are
+        # named so the positions stay unambiguous
+        args     = []
+        keywords = False
+        for name, optional in _fields(cls):
+            try: value = getattr(node, name)
+            except AttributeError:
+                keywords = True
+                continue
+            if replace is not None and name in replace:
+                self.dump(value)
+                value = replace[name]
+            if value is None and optional:
+                keywords = True
+                continue
+            value = self.dump(value)
+            args.append(f"{name}={value}" if keywords else value)
+
+        return f"{cls.__name__}({', '.join(args)})"
+
+    def _map(self, name: str, space: dict, pfx: str) -> str:
+        mapped = space.get(name)
+        if mapped is None:
+            mapped = space[name] = f"{pfx}{len(space)}"
+        return mapped
+
+    # Identifiers
+    def dump_Name(self, node: ast.Name) -> str:
+        """Keep ctx type (Load/Store) but replace id."""
+        name = self._map(node.id, self.var_map, "_V")
+        return f"Name({name!r}, {type(node.ctx).__name__}())"
+
+    def dump_arg(self, node: ast.arg) -> str:
+        # Annotations are dropped without being visited
+        arg = self._map(node.arg, self.arg_map, "_A")
+        return f"arg({arg!r})"
+
+    def dump_Attribute(self, node: ast.Attribute) -> str:
+        """
+        Replace attribute name with placeholder but keep the
+        structure (obj.attr -> obj._A0) and map attr name as
+        if it were a name (but distinct space)
+        """
+        value = self.dump(node.value)
+        attr  = self._map(node.attr, self.attr_map, "_AT")
+        return f"Attribute({value}, {attr!r}, " \
+             + f"{type(node.ctx).__name__}())"
+
+    def dump_Constant(self, node: ast.Constant) -> str:
+        # Replace with placeholder constant name (string) so
+        # the dump becomes deterministic
+        val = node.value
+        if val is None: kind = "NONE"
+        elif isinstance(val, str): kind = "STR"
+        elif isinstance(val, int): kind = "INT"
+        elif isinstance(val, bool): kind = "BOOL"
+        elif isinstance(val, float): kind = "FLOAT"
+        else: kind = "CONST"
+        return f"Constant({kind!r})"
+
+    def dump_FunctionDef(self, node: ast.FunctionDef) -> str:
+        # normalize function name to single token (we don't
+        # want to treat different function names as different
+        # blocks), and drop decorators and annotations (they
+        # can leak external names)
+        return self.generic_dump(node, {
+            "name": "_FN",
+            "decorator_list": ["_DEC"],
+            "returns": None,
+        })
+
+    def dump_ClassDef(self, node: ast.ClassDef) -> str:
+        decos = ["_DEC"] if node.decorator_list else []
+        return self.generic_dump(node, {
+            "name": "_CLS",
+            "bases": ["_BASE"] * len(node.bases),
+            "decorator_list": decos,
+        })
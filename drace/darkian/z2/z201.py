@@ -40,12 +40,12 @@ def check_z201(context: Context) -> list[Dict]:
     Conservative: uses AST to avoid false positives.
     """
     lines   = context["lines"]
-    tree    = context["tree"]
+    nodes   = context["nodes"]
     file    = context["file"]
     results = []
     src     = "\n".join(lines)
-    for node in ast.walk(tree):
-        if isinstance(node, CONTROL_NODE_TYPES):
+    for node_type in CONTROL_NODE_TYPES:
+        for node in nodes.get(node_type, []):
             # Ensure node has location info
             if not hasattr(node, "lineno") \
                 or not hasattr(node, "end_lineno"): continue
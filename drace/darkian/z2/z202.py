@@ -1,116 +1,49 @@
 # ======================== STANDARDS ========================
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from operator import itemgetter
+from typing import Callable
+import multiprocessing
 import hashlib
+import atexit
 import math
 import ast
+import os
 
 # ========================== LOCALS =========================
 from drace.types import Context, Dict
-from drace import utils
+from ._canon import Canonicalizer
 
 
-class Canonicalizer(ast.NodeTransformer):
+def stmt_canonical_hash(stmt: ast.stmt
+                       ) -> tuple[bytes, str]:
     """
-    Canonicalize AST blocks while preserving *semantic shape*.
-    Separate namespaces for vars / args / attrs.
-    Constants are bucketed by kind, not value.
+    Canonicalize a single statement and return its digest
+    together with the canonical dump it was taken of.
     """
+    dumped = Canonicalizer().dump(stmt)
+    digest = hashlib.blake2b(dumped.encode(), digest_size=16)
+    return digest.digest(), dumped
 
-    def __init__(self):
-        super().__init__()
-        self.var_map  = {}
-        self.arg_map  = {}
-        self.attr_map = {}
-
-        self._v  = 0
-        self._a  = 0
-        self._at = 0
-
-    def _map(self, name: str, space: dict, pfx: str) -> str:
-        if name not in space:
-            space[name] = f"{pfx}{len(space)}"
-        return space[name]
-
-    # Identifiers
-    def visit_Name(self, node: ast.Name):
-        """Keep ctx type (Load/Store) but replace id."""
-        new_id = self._map(node.id, self.var_map, "_V")
-        return ast.copy_location(ast.Name(id=new_id,
-               ctx=node.ctx), node)
-
-    def visit_arg(self, node: ast.arg):
-        new_arg = self._map(node.arg, self.arg_map, "_A")
-        return ast.copy_location(ast.arg(arg=new_arg,
-               annotation=None, type_comment=None), node)
-
-    def visit_Attribute(self, node: ast.Attribute):
-        """
-        Replace attribute name with placeholder but keep the
-        structure (obj.attr -> obj._A0) and map attr name as
-        if it were a name (but distinct space)
-        """
-        node     = self.generic_visit(node)
-        new_attr = self._map(node.attr, self.attr_map, "_AT")
-        return ast.copy_location(ast.Attribute(
-               value=node.value, attr=new_attr,
-               ctx=node.ctx), node)
-
-    def visit_Constant(self, node: ast.Constant):
-        # Replace with placeholder constant name (string) so
-        # ast.dump becomes deterministic
-        val = node.value
-        if val is None: kind = "NONE"
-        elif isinstance(val, str): kind = "STR"
-        elif isinstance(val, int): kind = "INT"
-        elif isinstance(val, bool): kind = "BOOL"
-        elif isinstance(val, float): kind = "FLOAT"
-        else: kind = "CONST"
-
-        # Represent placeholder as a NameConstant-like node
-        # to avoid mixing types
-        return ast.copy_location(ast.Constant(value=kind),
-               node)
-
-    def visit_FunctionDef(self, node: ast.FunctionDef):
-        # normalize function name to single token (we don't
-        # want to treat different function names as different
-        # blocks)
-        node      = self.generic_visit(node)
-        node.name = "_FN"
-
-        # drop decorators and annotations (they can leak
-        # external names)
-        node.decorator_list = ["_DEC"]
-        node.returns        = None
-        return node
-
-    def visit_ClassDef(self, node: ast.ClassDef):
-        node                = self.generic_visit(node)
-        node.name           = "_CLS"
-        node.bases          = ["_BASE"] * len(node.bases)
-        node.decorator_list = ["_DEC"] \
-                           if node.decorator_list else []
-        return node
-
-
-def canonical_block_dump(stmts: list[ast.stmt]) -> str:
+
+def canonical_block_hash(digests: list[bytes]) -> int:
     """
-    Given a list of statement AST nodes, produce a canonical
-    string representation.
+    Combine the digests of consecutive statements into a
+    64-bit key for the block they form. This only indexes
+    clones, so no cryptographic strength is needed.
     """
-    canon = Canonicalizer()
-    # Create a synthetic Module containing the stmts to
-    # maintain context
-    module = ast.Module(body=stmts, type_ignores=[])
-    module = canon.visit(module)
-    ast.fix_missing_locations(module)
+    digest = hashlib.blake2b(b"".join(digests), digest_size=8)
+    return int.from_bytes(digest.digest(), "little")
 
-    # Use ast.dump with sorted/consistent fields
-    dumped = ast.dump(module, annotate_fields=False,
-             include_attributes=False)
 
-    # Hash it for compactness
-    hashed = hashlib.sha256(dumped.encode()).hexdigest()
-    return hashed, dumped
+def canonical_block_dump(dumps: list[str]) -> str:
+    """
+    Join the canonical dumps of consecutive statements into
+    the canonical string representation of their block.
+    """
+    return "\x1e".join(dumps)
 
 
 def _is_trivial_by_line_ranges(matches: list[tuple[int, int]]
@@ -127,20 +60,23 @@ def _is_trivial_by_line_ranges(matches: list[tuple[int, int]]
     if len(matches) < 2: return False
 
     matches = sorted(matches)
-    for i, (start, end) in enumerate(matches):
+    for i in range(len(matches) - 1):
+        start, end = matches[i]
         if end - start == 1: return True
-        try:
-            if matches[i + 1][0] in range(start, end + 1):
-                return True
-        except IndexError: pass
+        if start <= matches[i + 1][0] <= end: return True
 
-    return False
+    start, end = matches[-1]
+    return end - start == 1
 
 
 def _is_argparse_like(dumped: str) -> bool:
-    # A very rough structural match
-    return dumped.count("Call(Attribute(Name(") >= 2 and \
-           utils.any_in("keyword(", "Constant(", eq=dumped)
+    # A very rough structural match: stop scanning at the
+    # second method call rather than counting them all
+    call  = "Call(Attribute(Name("
+    first = dumped.find(call)
+    if first < 0 or dumped.find(call, first + 1) < 0:
+        return False
+    return "keyword(" in dumped or "Constant(" in dumped
 
 
 def is_trivial_dump(dumped: str,
@@ -152,85 +88,271 @@ def is_trivial_dump(dumped: str,
     return False
 
 
-def has_control_flow(stmts):
-    control_nodes = (ast.While, ast.For, ast.If, ast.With,
-                     ast.Match, ast.Try)
-    return any(isinstance(s, control_nodes) for s in stmts)
-
-
 def score_candidate(count: int, length: int) -> int:
     return count * math.log(length + 1)
 
 
-def collect_sequences(tree: ast.AST, min_len: int = 2,
-                      max_len: int = 6) -> dict[str,
-                      list[tuple[int, int, str]]]:
+# Only blocks holding at least one of these are considered
+CONTROL_NODES = (ast.While, ast.For, ast.If, ast.With,
+                 ast.Match, ast.Try)
+
+# Blocks repeated fewer times than this are not reported
+MIN_OCCURRENCES = 3
+
+# Statement types whose bodies are scanned for repeated
+# sequences, mapped to the fields holding those bodies
+BODY_FIELDS = {
+    ast.FunctionDef: ("body",),
+    ast.AsyncFunctionDef: ("body",),
+    ast.If: ("body", "orelse"),
+    ast.For: ("body", "orelse"),
+    ast.While: ("body", "orelse"),
+    ast.With: ("body",),
+    ast.Try: ("body", "orelse", "finalbody"),
+}
+
+# Fields through which a statement can own nested statements
+NESTED_FIELDS = ("body", "handlers", "orelse", "finalbody",
+                 "cases")
+
+
+def _nested_stmts(stmt: ast.stmt) -> list[ast.stmt]:
+    """Statements directly nested in a compound statement."""
+    nested = []
+    for field in NESTED_FIELDS:
+        for child in getattr(stmt, field, ()):
+            # Except handlers and match cases wrap their body
+            if isinstance(child, ast.stmt):
+                nested.append(child)
+            else: nested.extend(child.body)
+    return nested
+
+
+def walk_bodies(tree: ast.Module,
+                on_body: Callable[[list[ast.stmt]], None]
+               ) -> None:
+    """
+    Call `on_body` on every statement body of the tree, in
+    source order. Only statement lists are walked; expression
+    subtrees can never hold a body so they are skipped.
     """
-    Walk the tree and collect contiguous sequences of
-    statements from bodies.
+    on_body(tree.body)
+    stack = list(reversed(tree.body))
+
+    while stack:
+        stmt   = stack.pop()
+        fields = BODY_FIELDS.get(type(stmt), ())
+        for field in fields: on_body(getattr(stmt, field))
+        if type(stmt) is ast.Try:
+            for h in stmt.handlers: on_body(h.body)
+        stack.extend(reversed(_nested_stmts(stmt)))
 
-    Returns mapping: hash -> list of (start_lineno,
-                     end_lineno, dumped)
+
+def collect_bodies(tree: ast.Module, min_len: int = 2,
+                   max_len: int = 6, nested: bool = True
+                  ) -> list[tuple[list, list, list, list]]:
     """
-    sequences = {}
+    Walk the tree and canonicalize the statements of every
+    body a sequence can be taken from. With `nested` off, only
+    the module body itself is scanned.
+
+    Returns one (ctrl, digests, dumps, spans) tuple per body:
+      - ctrl[j]: control-flow statements before statement j
+      - digests/dumps: per statement, None where no window
+        needs it
+      - spans: per statement (start_lineno, end_lineno)
+    """
+    bodies = []
+
+    def _collect(stmts: list[ast.stmt]):
+        n = len(stmts)
+        if n < min_len: return
+
+        # Only windows holding control flow are considered
+        ctrl = [0]
+        for s in stmts:
+            ctrl.append(ctrl[-1]
+                      + isinstance(s, CONTROL_NODES))
+        if not ctrl[-1]: return
+
+        # A statement is in some window iff a control-flow
+        # statement lies within a window's reach of it
+        reach   = min(max_len, n) - 1
+        digests = [None] * n
+        dumps   = [None] * n
+        for j in range(n):
+            lo = max(0, j - reach)
+            hi = min(n, j + reach + 1)
+            if ctrl[hi] == ctrl[lo]: continue
+            digests[j], dumps[j] = stmt_canonical_hash(
+                                   stmts[j])
+
+        spans = [(s.lineno, getattr(s, "end_lineno",
+                 s.lineno)) for s in stmts]
+        bodies.append((ctrl, digests, dumps, spans))
+
+    if nested: walk_bodies(tree, _collect)
+    else: _collect(tree.body)
+    return bodies
+
+
+def collect_sequences(bodies: list[tuple[list, list, list,
+                      list]], min_len: int = 2,
+                      max_len: int = 6) -> tuple[dict[int |
+                      str, list[tuple[int, int]]], dict[int |
+                      str, str]]:
+    """
+    Collect the contiguous sequences of statements of the
+    given bodies (see collect_bodies).
 
-    # Helper to walk every body (list of statements) in
-    # relevant nodes
-    class BodyWalker(ast.NodeVisitor):
-        def _walk_and_visit(self, node, orelse: bool):
-            self._walk_body(node.body)
-            if orelse: self._walk_body(node.orelse)
-            self.generic_visit(node)
-
-        def visit_FunctionDef(self, node: ast.FunctionDef):
-            self._walk_and_visit(node, orelse=False)
-
-        def visit_If(self, node: ast.If):
-            self._walk_and_visit(node, orelse=True)
-
-        def visit_For(self, node: ast.For):
-            self._walk_and_visit(node, orelse=True)
-
-        def visit_While(self, node: ast.While):
-            self._walk_and_visit(node, orelse=True)
-
-        def visit_With(self, node: ast.With):
-            self._walk_and_visit(node, orelse=False)
-
-        def visit_Try(self, node: ast.Try):
-            self._walk_body(node.body)
-            self._walk_body(node.orelse)
-            self._walk_body(node.finalbody)
-            for h in node.handlers: self._walk_body(h.body)
-            self.generic_visit(node)
-
-        def visit_Module(self, node: ast.Module):
-            self._walk_and_visit(node, orelse=False)
-
-        def _walk_body(self, stmts: list[ast.stmt]):
-            # Convert list of stmts into sliding windows of
-            # sizes max_len..min_len (longer first)
-            n = len(stmts)
-            # Build linear list of lineno for bounds
-            for length in range(max_len, min_len - 1, -1):
-                if n < length: continue
-                for i in range(0, n - length + 1):
-                    block = stmts[i:i + length]
-
-                    if not hasattr(block[0], "lineno"):
-                        continue
-                    if not has_control_flow(block): continue
-
-                    h, dumped = canonical_block_dump(block)
-                    start     = block[0].lineno
-                    end       = getattr(block[-1],
-                                "end_lineno",
-                                block[-1].lineno)
-                    sequences.setdefault(h, []).append((
-                        start, end, dumped))
-
-    BodyWalker().visit(tree)
-    return sequences
+    A sequence can only repeat if each of its statements does,
+    so windows holding a statement whose digest is unique in
+    the file are skipped before being keyed.
+
+    Sequences are keyed by canonical_block_hash. A block whose
+    hash collides with a different block's is keyed by its
+    canonical dump instead.
+
+    Returns two mappings:
+      - hash -> list of (start_lineno, end_lineno)
+      - hash -> dump of the first occurrence
+    """
+    counts    = Counter(d for _, digests, _, _ in bodies
+                for d in digests if d is not None)
+    sequences = {}
+    samples   = {}
+    firsts    = {}
+
+    for ctrl, digests, dumps, spans in bodies:
+        # lone[j] counts statements before j that never repeat
+        n    = len(digests)
+        lone = [0]
+        for d in digests: lone.append(lone[-1]
+                                    + (counts[d] < 2))
+
+        # Convert list of stmts into sliding windows of
+        # sizes max_len..min_len (longer first)
+        for length in range(max_len, min_len - 1, -1):
+            if n < length: continue
+            for i in range(0, n - length + 1):
+                if ctrl[i + length] == ctrl[i]: continue
+                if lone[i + length] != lone[i]: continue
+
+                keyed = digests[i:i + length]
+                h     = canonical_block_hash(keyed)
+                start = spans[i][0]
+                end   = spans[i + length - 1][1]
+
+                # Only the first occurrence builds the dump
+                first = firsts.get(h)
+                if first is None:
+                    firsts[h]    = (digests, i, length)
+                    sequences[h] = [(start, end)]
+                    samples[h]   = canonical_block_dump(
+                                   dumps[i:i + length])
+                    continue
+
+                # Hits are checked against the first occurrence;
+                # a block that only shares its hash is keyed by
+                # its dump instead
+                seen, k, size = first
+                if size == length and seen[k:k + size] == keyed:
+                    sequences[h].append((start, end))
+                    continue
+                dumped = canonical_block_dump(
+                         dumps[i:i + length])
+                if dumped in sequences:
+                    sequences[dumped].append((start, end))
+                else:
+                    sequences[dumped] = [(start, end)]
+                    samples[dumped]   = dumped
+
+    return sequences, samples
+
+
+# Files whose nested bodies span fewer lines than this are
+# scanned in-process; process start-up would dominate
+PARALLEL_MIN_LINES = 3000
+_EXECUTOR          = None
+
+
+def _worker_count() -> int:
+    """CPUs this process may run on, honouring its affinity."""
+    try: return len(os.sched_getaffinity(0))
+    except AttributeError: return os.cpu_count() or 1
+
+
+def collect_chunk_bodies(source: str, offset: int,
+                         min_len: int = 2, max_len: int = 6
+                        ) -> list[tuple[list, list, list,
+                         list]]:
+    """
+    Collect the bodies nested in one top-level statement,
+    given its source and the line number it starts after.
+    Worker processes are sent chunks as source, which is far
+    cheaper to pickle than the nodes themselves.
+    """
+    tree = ast.parse(source)
+    ast.increment_lineno(tree, offset)
+    return collect_bodies(tree, min_len, max_len)
+
+
+def _chunk_sources(chunks: list[ast.stmt], lines: list[str]
+                  ) -> list[tuple[str, int]]:
+    """Source and line offset of every top-level statement."""
+    sources = []
+    for stmt in chunks:
+        decos = getattr(stmt, "decorator_list", [])
+        start = min([d.lineno for d in decos] + [stmt.lineno])
+        end   = stmt.end_lineno
+        sources.append(("\n".join(lines[start - 1:end]),
+                        start - 1))
+    return sources
+
+
+def collect_file_bodies(tree: ast.Module, lines: list[str]
+                       ) -> list[tuple[list, list, list,
+                        list]]:
+    """
+    Collect the bodies of the whole file (see collect_bodies)
+    in source order. Bodies nested in top-level statements
+    are independent chunks; large files spread those across
+    a process pool shared by all files, anything else is
+    scanned in place.
+    """
+    global _EXECUTOR
+    chunks  = [stmt for stmt in tree.body if _nested_stmts(
+               stmt)]
+    n_lines = sum(s.end_lineno - s.lineno + 1 for s in chunks)
+    workers = _worker_count()
+
+    # Daemonic processes (e.g. multiprocessing.Pool workers)
+    # may not start children of their own
+    if workers < 2 or len(chunks) < 2 \
+            or n_lines < PARALLEL_MIN_LINES \
+            or multiprocessing.current_process().daemon:
+        return collect_bodies(tree)
+
+    sources, offsets = zip(*_chunk_sources(chunks, lines))
+    chunksize        = max(1, len(chunks) // (workers * 4))
+    bodies           = collect_bodies(tree, nested=False)
+    try:
+        # The pool outlives the file; make sure it is shut
+        # down with the interpreter rather than left to linger
+        if _EXECUTOR is None:
+            _EXECUTOR = ProcessPoolExecutor(max_workers=workers)
+            atexit.register(_EXECUTOR.shutdown)
+        for chunk_bodies in _EXECUTOR.map(collect_chunk_bodies,
+                sources, offsets, chunksize=chunksize):
+            bodies.extend(chunk_bodies)
+    except (BrokenProcessPool, OSError, RuntimeError):
+        # A failed pool is shut down and dropped so the next
+        # large file starts a fresh one; this one is scanned here
+        if _EXECUTOR is not None:
+            _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+        _EXECUTOR = None
+        return collect_bodies(tree)
+    return bodies
 
 
 def check_z202(context: Context) -> list[Dict]:
@@ -241,33 +363,44 @@ def check_z202(context: Context) -> list[Dict]:
     Returns list of issues; each issue contains occurrences
     and a short message
     """
+    lines   = context["lines"]
     tree    = context["tree"]
+    nodes   = context["nodes"]
     file    = context["file"]
-    seqs    = collect_sequences(tree)
     results = []
     limit   = 8
 
-    # seqs: mapping h -> list[(start, end, dumped)]
+    # Nothing can be reported without control flow, or with
+    # too few statements for MIN_OCCURRENCES blocks of at
+    # least two statements each
+    n_stmts = sum(len(found) for node_type, found in
+              nodes.items() if issubclass(node_type, ast.stmt))
+    if n_stmts < 2 * MIN_OCCURRENCES or not any(
+            nodes.get(t) for t in CONTROL_NODES): return []
+
+    # Bodies are walked here rather than taken from nodes: the
+    # index groups nodes by type, losing the source order
+    # that equal-score candidates are ranked in, and pool
+    # workers re-parse their chunks with no index to share
+    bodies        = collect_file_bodies(tree, lines)
+    seqs, samples = collect_sequences(bodies)
+
+    # seqs: mapping h -> list[(start, end)]
     # Build candidate meta list
     candidates = []
     for h, occ in seqs.items():
-        # Collapse duplicates that start at same line (keep
-        # earliest end)
-        seen = {}
-        for start, end, dumped in occ:
-            key       = (start, end)
-            seen[key] = dumped
-        occ_unique = [(s, e, seen[(s, e)]) for s, e in seen]
-        if len(occ_unique) < 3: continue
+        # Most hashes occur once; skip them before collapsing
+        # duplicate occurrences
+        if len(occ) < MIN_OCCURRENCES: continue
+        occ_unique = sorted(set(occ))
+        if len(occ_unique) < MIN_OCCURRENCES: continue
 
         # Prefer non-trivial blocks
-        line_ranges   = [(s, e) for s, e, _ in occ_unique]
-        _, _, dumped0 = occ_unique[0]
-        if is_trivial_dump(dumped0, line_ranges): continue
+        if is_trivial_dump(samples[h], occ_unique): continue
 
         # Candidate metadata
-        first_start = min(s for s, e, d in occ_unique)
-        first_end   = max(e for s, e, d in occ_unique)
+        first_start = min(s for s, e in occ_unique)
+        first_end   = max(e for s, e in occ_unique)
 
         # Length in lines (used for sorting preference)
         length = first_end - first_start + 1
@@ -283,23 +416,33 @@ def check_z202(context: Context) -> list[Dict]:
     if not candidates: return []
 
     # Sort by score
-    candidates.sort(key=lambda c: c["score"], reverse=True)
+    candidates.sort(key=itemgetter("score"), reverse=True)
 
     # Greedy select non-overlapping candidates
     selected = []
-    occupied = set()
+
+    # Occupied lines as sorted, disjoint intervals: starts[k]
+    # to ends[k] inclusive
+    starts = []
+    ends   = []
 
     def range_overlaps_with_occupied(start, end):
-        # O(length) check; fine for typical blocks
-        for ln in range(start, end + 1):
-            if ln in occupied: return True
-        return False
+        idx = bisect_right(starts, end)
+        return idx > 0 and ends[idx - 1] >= start
+
+    def occupy(start, end):
+        # Merge with every interval it overlaps or touches
+        lo = bisect_left(ends, start - 1)
+        hi = bisect_right(starts, end + 1)
+        if lo < hi:
+            start = min(start, starts[lo])
+            end   = max(end, ends[hi - 1])
+        starts[lo:hi] = [start]
+        ends[lo:hi]   = [end]
 
     for cand in candidates:
-        # Build list of unique (start, end) occurrences for
-        # this candidate
-        occs = sorted({(s, e) for s, e, d in
-               cand["occurrences"]}, key=lambda t: t[0])
+        # Unique (start, end) occurrences, already sorted
+        occs = cand["occurrences"]
 
         # If all occurrences would overlap existing
         # selections, skip candidate
@@ -314,8 +457,7 @@ def check_z202(context: Context) -> list[Dict]:
 
         # Mark all selected occurrences' lines as occupied to
         # prevent downstream overlaps
-        for s, e in non_overlapping_occs:
-            for ln in range(s, e + 1): occupied.add(ln)
+        for s, e in non_overlapping_occs: occupy(s, e)
         selected.append({
             "hash": cand["hash"],
             "primary": (primary_start, primary_end),
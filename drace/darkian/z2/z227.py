@@ -116,6 +116,7 @@ def check_z227(context: Context) -> list[Dict]:
     flagged.
     """
     tree    = context["tree"]
+    nodes   = context["nodes"]
     file    = context["file"]
     results = []
 
@@ -152,9 +153,9 @@ def check_z227(context: Context) -> list[Dict]:
             module_globals.add(node.name)
 
     # 3. Walk through all functions and check for hidden deps
-    for node in ast.walk(tree):
-        if isinstance(node, (ast.FunctionDef,
-                ast.AsyncFunctionDef, ast.Lambda)):
+    for node_type in (ast.FunctionDef, ast.AsyncFunctionDef,
+                      ast.Lambda):
+        for node in nodes.get(node_type, []):
             if isinstance(node.parent, ast.Module): continue
             # Collect used names inside this function
             used_names = iter_used_names(node)
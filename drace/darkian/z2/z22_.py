@@ -1,7 +1,7 @@
 import builtins
 import ast
 
-from drace.types import Context, Dict
+from drace.types import Context, Dict, NodeIndex
 from drace import utils
 
 # =================== Z220 to Z229 Draft ====================
@@ -13,9 +13,9 @@ BUILTINS = set(dir(builtins))
 def _get_assignments(node):
     return [n for n in ast.walk(node) if isinstance(n, (ast.Assign, ast.AnnAssign))]
 
-def _get_function_defs(node):
+def _get_function_defs(nodes: NodeIndex):
 
-    return [n for n in ast.walk(node) if isinstance(n, ast.FunctionDef)]
+    return nodes.get(ast.FunctionDef, [])
 
 def _hash_node(node: ast.AST) -> str:
     """Return a normalized string representation for repeated logic detection."""
@@ -60,12 +60,12 @@ def _hash_node(node: ast.AST) -> str:
 
 
 # --------------- Z221: Orthogonal Functions ----------------
-def Z221_check(tree, file: str) -> list[dict]:
+def Z221_check(nodes: NodeIndex, file: str) -> list[dict]:
     results = []
 
     composite_blocks = (ast.If, ast.For, ast.While, ast.Try, 
                         ast.With, ast.Match)
-    for func in _get_function_defs(tree):
+    for func in _get_function_defs(nodes):
         top_blocks = [n for n in func.body if isinstance(
                       n, composite_blocks)]
         steps      = len(top_blocks)
@@ -85,10 +85,10 @@ def Z221_check(tree, file: str) -> list[dict]:
 
 
 # ---------------- Z222: Tight Coupling ----------------
-def Z222_check(tree, file: str) -> list[dict]:
+def Z222_check(nodes: NodeIndex, file: str) -> list[dict]:
     results = []
 
-    for func in _get_function_defs(tree):
+    for func in _get_function_defs(nodes):
         local_vars = {n.id for n in ast.walk(func) if 
                      isinstance(n, ast.Name) and
                      isinstance(getattr(n, 'ctx', None),
@@ -115,10 +115,10 @@ def Z222_check(tree, file: str) -> list[dict]:
 
 
 # -------------- Z223: Implicit State Mutation --------------
-def Z223_check(tree, file: str) -> list[dict]:
+def Z223_check(nodes: NodeIndex, file: str) -> list[dict]:
     results = []
 
-    for func in _get_function_defs(tree):
+    for func in _get_function_defs(nodes):
         for node in ast.walk(func):
             if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Attribute):
                 attr = node.targets[0]
@@ -134,10 +134,10 @@ def Z223_check(tree, file: str) -> list[dict]:
 
 
 # ---------------- Z224: Parameter Explosion ----------------
-def Z224_check(tree, file: str) -> list[dict]:
+def Z224_check(nodes: NodeIndex, file: str) -> list[dict]:
     results = []
 
-    for func in _get_function_defs(tree):
+    for func in _get_function_defs(nodes):
         if len(func.args.args) > 6:
             results.append({
                 'file': file,
@@ -150,12 +150,12 @@ def Z224_check(tree, file: str) -> list[dict]:
 
 
 # ------------ Z225: Overloaded Data Structures -------------
-def Z225_check(tree, file: str) -> list[dict]:
+def Z225_check(nodes: NodeIndex, file: str) -> list[dict]:
     results = []
 
-    for node in ast.walk(tree):
+    for node in nodes.get(ast.Dict, []):
         # --- Skip dicts used in .items() pattern ---
-        if isinstance(node, ast.Dict) and len(node.keys) > 5:
+        if len(node.keys) > 5:
             parent = getattr(node, 'parent', None)
             if isinstance(parent, ast.Call) and isinstance(
                     parent.func, ast.Attribute):
@@ -169,20 +169,20 @@ def Z225_check(tree, file: str) -> list[dict]:
                 'msg': 'dict has too many keys; consider splitting responsibilities'
             })
 
-        elif isinstance(node, ast.ClassDef):
-            public_attrs = [
-                n.targets[0].id for n in node.body
-                if isinstance(n, ast.Assign)
-                and isinstance(n.targets[0], ast.Name)
-            ]
-            if len(public_attrs) > 5:
-                results.append({
-                    'file': file,
-                    'line': node.lineno,
-                    'col': 1,
-                    'code': 'Z225',
-                    'msg': 'class has many public attributes; consider SRP'
-                })
+    for node in nodes.get(ast.ClassDef, []):
+        public_attrs = [
+            n.targets[0].id for n in node.body
+            if isinstance(n, ast.Assign)
+            and isinstance(n.targets[0], ast.Name)
+        ]
+        if len(public_attrs) > 5:
+            results.append({
+                'file': file,
+                'line': node.lineno,
+                'col': 1,
+                'code': 'Z225',
+                'msg': 'class has many public attributes; consider SRP'
+            })
 
     return results
 
@@ -211,41 +211,39 @@ def Z226_check(lines: list[str], file: str) -> list[dict]:
 
 
 # ---------------- Z228: Abstraction Leak ----------------
-def Z228_check(tree, file: str) -> list[dict]:
+def Z228_check(nodes: NodeIndex, file: str) -> list[dict]:
     results = []
 
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Return):
-            if isinstance(node.value, (ast.List, ast.Dict, ast.Set)):
-                results.append({
-                    'file': file,
-                    'line': node.lineno,
-                    'col': 1,
-                    'code': 'Z228',
-                    'msg': 'returning internal data structure; consider interface or copy'
-                })
+    for node in nodes.get(ast.Return, []):
+        if isinstance(node.value, (ast.List, ast.Dict, ast.Set)):
+            results.append({
+                'file': file,
+                'line': node.lineno,
+                'col': 1,
+                'code': 'Z228',
+                'msg': 'returning internal data structure; consider interface or copy'
+            })
     return results
 
 
 # --------------- Z229: Unstable API Patterns ---------------
-def Z229_check(tree, file: str) -> list[dict]:
+def Z229_check(nodes: NodeIndex, file: str) -> list[dict]:
     results = []
 
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
-            returns = [n for n in ast.walk(node) if isinstance(n, ast.Return)]
-            types_seen = set()
-            for r in returns:
-                if hasattr(r.value, '__class__'):
-                    types_seen.add(type(r.value).__name__)
-            if len(types_seen) > 3:
-                results.append({
-                    'file': file,
-                    'line': node.lineno,
-                    'col': 1,
-                    'code': 'Z229',
-                    'msg': 'function has multiple return types; consider consistent API'
-                })
+    for node in nodes.get(ast.FunctionDef, []):
+        returns = [n for n in ast.walk(node) if isinstance(n, ast.Return)]
+        types_seen = set()
+        for r in returns:
+            if hasattr(r.value, '__class__'):
+                types_seen.add(type(r.value).__name__)
+        if len(types_seen) > 3:
+            results.append({
+                'file': file,
+                'line': node.lineno,
+                'col': 1,
+                'code': 'Z229',
+                'msg': 'function has multiple return types; consider consistent API'
+            })
     return results
 
 # ------------------------ Run Checks -----------------------
@@ -254,11 +252,11 @@ def check_Z22_(context: Context) -> list[Dict]:
              Z225_check, Z228_check, Z229_check]
 
     lines   = context["lines"]
-    tree    = context["tree"]
+    nodes   = context["nodes"]
     file    = context["file"]
     results = []
 
-    for rule in rules: results.extend(rule(tree, file))
+    for rule in rules: results.extend(rule(nodes, file))
     results.extend(Z226_check(lines, file))
 
     return results
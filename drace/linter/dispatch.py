@@ -0,0 +1,17 @@
+# ======================= STANDARDS =========================
+from collections import defaultdict
+import ast
+
+# ========================= LOCALS ==========================
+from drace.types import NodeIndex
+
+
+def index_nodes(tree: ast.AST) -> NodeIndex:
+    """
+    Walk the tree once and group its nodes by type, each group
+    in `ast.walk` order. Rules look up the node types they
+    care about here instead of each re-walking the tree.
+    """
+    nodes = defaultdict(list)
+    for node in ast.walk(tree): nodes[type(node)].append(node)
+    return nodes
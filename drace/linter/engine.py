@@ -5,6 +5,7 @@ import io
 # ========================= LOCALS ==========================
 from drace.constants import IGNORED_RULES, ONLY
 from drace.darkian import get_rules
+from .dispatch import index_nodes
 from .pycodestyle import Checker
 from .pyflakes import flake_api
 from drace import utils
@@ -88,18 +89,16 @@ def run_flake_checks(file: str | Path) -> list[dict]:
 
 def run_darkian_checks(file: str | Path) -> list[dict]:
     """Run Darkian checks on a file."""
-    lines   = Path(file).read_text(encoding="utf-8")\
-              .splitlines()
     file    = str(file)
     results = []
 
-    tree, synerrs = utils.tolerant_parse_module(lines, True)
-    utils.annotate_parents(tree)
-    tree.parent = tree
+    lines, tree, synerrs = utils.parse_file(file)
+    tree.parent          = tree
 
     context = {
         "lines": lines,
          "tree": tree,
+        "nodes": index_nodes(tree),
          "file": file,
     }
 
@@ -3,7 +3,7 @@
 from io import StringIO
 
 # ========================== LOCALS =========================
-from drace.utils import tolerant_parse_module
+from drace.utils import parse_file
 from .reporter import Reporter
 from .checker import Checker
 
@@ -15,11 +15,11 @@ def check(filename: str, buffer: StringIO):
     """
     Check the Python source given by C{source} for flakes.
     """
-    with open(filename) as f: source = f.read()
     reporter = Reporter(buffer, buffer)
 
-    # First, compile into an AST and handle syntax errors.
-    tree = tolerant_parse_module(source)
+    # First, compile into an AST and handle syntax errors. The
+    # parse is shared with the other checkers run on the file.
+    _, tree, _ = parse_file(filename)
 
     # Okay, it's syntactically valid.  Now check it.
     w = Checker(tree, filename=filename)
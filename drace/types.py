@@ -2,9 +2,14 @@ from typing import TypedDict
 import ast
 
 
+# Nodes of a tree grouped by their exact type
+NodeIndex = dict[type[ast.AST], list[ast.AST]]
+
+
 class Context(TypedDict):
     lines: list[str]
     tree:  ast.Module
+    nodes: NodeIndex
     file:  str
 
 
@@ -1,8 +1,10 @@
 # ========================= STANDARDS =======================
+from functools import lru_cache
 from typing import NoReturn
 from pathlib import Path
 import ast
 import sys
+import os
 
 # ======================= THIRD-PARTIES =====================
 from tuikit.logictools import any_eq, any_in, all_in
@@ -126,6 +128,31 @@ def tolerant_parse_module(source: list[str]|str,
     return tree
 
 
+@lru_cache(maxsize=16)
+def _parse_file(file: str, mtime_ns: int, size: int
+               ) -> tuple[list[str], ast.Module, list]:
+    lines = Path(file).read_text(encoding="utf-8").splitlines()
+    return (lines, *tolerant_parse_module(lines, True))
+
+
+def parse_file(file: str | Path
+              ) -> tuple[list[str], ast.Module, list]:
+    """
+    Read and tolerantly parse a file, returning its lines, the
+    tree and any syntax errors. Results are cached by path,
+    mtime and size so every checker run on the same file
+    shares one parse.
+
+    The shared tree is annotated in place: every node gets a
+    `.parent` link here, the engine links the root to itself
+    and pyflakes' Checker adds `_pyflakes_parent` and
+    `_pyflakes_depth`. Callers may add such annotations but
+    must not otherwise modify the lines or the tree.
+    """
+    stat = os.stat(file)
+    return _parse_file(str(file), stat.st_mtime_ns, stat.st_size)
+
+
 def discover_code_files(path: Path) -> list[Path] | NoReturn:
     supported = [".py"]  # will expand as I learn more langs
 
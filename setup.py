@@ -1,7 +1,36 @@
-from setuptools import setup
+# ======================== STANDARDS ========================
+import os
+
+# ====================== THIRD PARTIES ======================
+from setuptools import Extension, setup
+
+
+# The compiled canonicalizer is an optional accelerator for
+# Z202: _canon.py is compiled as-is (typed by _canon.pxd)
+# when Cython is installed in the build environment, else
+# from the C file an sdist built with Cython ships. A failed
+# build falls back to the module itself.
+#
+# Cython is deliberately left out of [build-system].requires,
+# so isolated builds (pip install, python -m build) ship the
+# pure-Python module; build without isolation to compile it
+CANON = "drace/darkian/z2/_canon"
+try: from Cython.Build import cythonize
+except ImportError: cythonize = None
+
+if cythonize and os.path.exists(f"{CANON}.py"):
+    ext_modules = cythonize([Extension(
+        "drace.darkian.z2._canon", [f"{CANON}.py"],
+        optional=True,
+    )], language_level=3)
+elif os.path.exists(f"{CANON}.c"):
+    ext_modules = [Extension("drace.darkian.z2._canon",
+                   [f"{CANON}.c"], optional=True)]
+else: ext_modules = []
 
 
 setup(
     author="Caleb M. Sibanda",
-    author_email="darkian.dev@gmail.com"
-)
\ No newline at end of file
+    author_email="darkian.dev@gmail.com",
+    ext_modules=ext_modules,
+)